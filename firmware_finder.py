@@ -5,23 +5,70 @@ Searches and downloads LG TV firmware from various sources
 
 import os
 import re
+import shutil
+import hashlib
+import ipaddress
+import subprocess
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Dict
+from urllib.parse import urlparse
+from typing import Optional, List, Dict, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# One arp-scan result line: IP, MAC and an LG vendor string
+_ARP_LINE = re.compile(
+    rb'^(\d+\.\d+\.\d+\.\d+)\s+([0-9a-f:]{17})\s+(.*LG.*)$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+_MODEL_BASE_RE = re.compile(r'([A-Z0-9]{6,15})')
+
+
+@lru_cache(maxsize=512)
+def _model_base(tv_model: str) -> str:
+    """Extract base model number from a TV model string"""
+    # Remove common prefixes
+    model = tv_model.upper().replace("LG-", "").replace("LG", "")
+    # Get the alphanumeric part (usually first 10-15 chars)
+    match = _MODEL_BASE_RE.match(model)
+    return match.group(1) if match else model
+
 
 class FirmwareFinder:
     """Find and download LG TV firmware"""
 
+    # Known compatible reference models. This is a static list - in a real
+    # implementation, you might scrape this from LG's reference database
+    _COMPAT_MAP: Dict[str, Tuple[str, ...]] = {
+        '43UP75006LF': ('43NANO75KPA', '43NANO77KPA', '43UP75', '43UP77'),
+        '55UP75006LF': ('55NANO75KPA', '55NANO77KPA', '55UP75', '55UP77'),
+        '65UP75006LF': ('65NANO75KPA', '65NANO77KPA', '65UP75', '65UP77'),
+    }
+
     def __init__(self, tv_model: str, target_version: str):
         self.tv_model = tv_model.upper()
         self.target_version = target_version
         self.firmware_dir = Path(__file__).parent / "firmware"
         self.firmware_dir.mkdir(exist_ok=True)
 
+        # Shared HTTP session so repeated requests reuse pooled connections
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'LGTV-Firmware-Downgrade'
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(total=3, backoff_factor=0.3)
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
         # Known firmware sources and patterns
         self.lg_sites = {
             'korea': 'https://www.lge.co.kr/support/product-manuals',
@@ -51,21 +98,18 @@ class FirmwareFinder:
 
     def _check_cache(self) -> Optional[str]:
         """Check if firmware is already downloaded"""
-        pattern = re.compile(rf'.*{self.target_version.replace(".", r"\.")}\.epk', re.IGNORECASE)
+        suffix = f"{self.target_version}.epk".casefold()
 
-        for file in self.firmware_dir.glob("*.epk"):
-            if pattern.match(file.name):
-                return str(file)
+        with os.scandir(self.firmware_dir) as it:
+            for entry in it:
+                if entry.name.casefold().endswith(suffix) and entry.is_file():
+                    return entry.path
 
         return None
 
     def _extract_model_base(self) -> str:
         """Extract base model number from TV model"""
-        # Remove common prefixes
-        model = self.tv_model.replace("LG-", "").replace("LG", "")
-        # Get the alphanumeric part (usually first 10-15 chars)
-        match = re.match(r'([A-Z0-9]{6,15})', model)
-        return match.group(1) if match else model
+        return _model_base(self.tv_model)
 
     def _provide_manual_instructions(self, model_base: str) -> Optional[str]:
         """Provide manual download instructions"""
@@ -114,71 +158,149 @@ Then run this utility again.
         print(instructions)
         return None
 
+    def download_firmware(self, url: str, sha256: Optional[str] = None) -> Optional[str]:
+        """Download firmware from a direct URL, resuming a partial download"""
+        name = os.path.basename(urlparse(url).path)
+        if name in ('', '.', '..'):
+            logger.error(f"Cannot determine firmware file name from URL: {url}")
+            return None
+
+        dest = self.firmware_dir / name
+        partial = dest.with_name(dest.name + '.part')
+
+        # Resume from where an interrupted download stopped
+        offset = partial.stat().st_size if partial.exists() else 0
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=30) as response:
+                if offset and response.status_code == 416:
+                    # Nothing left past our offset: the partial file is complete
+                    # unless the server reports a different size ("bytes */N")
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                    if total.isdigit() and int(total) != offset:
+                        logger.error(f"Partial download of {name} does not match the server's file")
+                        partial.unlink()
+                        return None
+                else:
+                    response.raise_for_status()
+                    if offset and response.status_code != 206:
+                        logger.info("Server does not support resume, restarting download")
+                        offset = 0
+
+                    # Stream straight to disk instead of buffering the whole file
+                    response.raw.decode_content = False
+                    with open(partial, 'ab' if offset else 'wb') as f:
+                        shutil.copyfileobj(response.raw, f, length=1 << 20)
+        except (requests.RequestException, Urllib3Error, OSError) as e:
+            # Reading response.raw directly surfaces urllib3's own errors
+            # (ProtocolError, ReadTimeoutError) rather than requests' wrappers
+            logger.error(f"Download failed: {e}")
+            return None
+
+        if sha256 and self._sha256(partial) != sha256.lower():
+            logger.error(f"Checksum mismatch for {name}")
+            partial.unlink()
+            return None
+
+        partial.replace(dest)
+        logger.info(f"Downloaded firmware: {dest}")
+        return str(dest)
+
+    @staticmethod
+    def _sha256(path: Path) -> str:
+        """Compute the SHA-256 hex digest of a file"""
+        with open(path, 'rb') as f:
+            if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+            return digest.hexdigest()
+
     def verify_firmware(self, firmware_path: str) -> bool:
         """Verify firmware file is valid"""
-        path = Path(firmware_path)
-
-        if not path.exists():
+        try:
+            st = os.stat(firmware_path)
+        except FileNotFoundError:
             logger.error(f"Firmware file not found: {firmware_path}")
             return False
 
-        if not path.suffix.lower() == '.epk':
-            logger.error(f"Invalid firmware format: {path.suffix}")
+        if not firmware_path.lower().endswith('.epk'):
+            logger.error(f"Invalid firmware format: {os.path.splitext(firmware_path)[1]}")
             return False
 
         # Check file size (should be at least 100MB)
-        size_mb = path.stat().st_size / (1024 * 1024)
+        size_mb = st.st_size >> 20
         if size_mb < 100:
-            logger.warning(f"Firmware file seems small: {size_mb:.1f}MB")
+            logger.warning(f"Firmware file seems small: {size_mb}MB")
             return False
 
-        logger.info(f"Firmware verified: {path.name} ({size_mb:.1f}MB)")
+        logger.info(f"Firmware verified: {os.path.basename(firmware_path)} ({size_mb}MB)")
         return True
 
-    def get_compatible_models(self) -> List[str]:
+    def get_compatible_models(self) -> Tuple[str, ...]:
         """Get list of known compatible models"""
-        # This is a static list - in a real implementation,
-        # you might scrape this from LG's reference database
-        compat_map = {
-            '43UP75006LF': ['43NANO75KPA', '43NANO77KPA', '43UP75', '43UP77'],
-            '55UP75006LF': ['55NANO75KPA', '55NANO77KPA', '55UP75', '55UP77'],
-            '65UP75006LF': ['65NANO75KPA', '65NANO77KPA', '65UP75', '65UP77'],
-        }
-
-        return compat_map.get(self._extract_model_base(), [])
-
-    def search_local_network(self) -> Optional[Dict]:
-        """Search for LG TVs on local network"""
-        import socket
-        import subprocess
-
-        logger.info("Scanning local network for LG TVs...")
+        return self._COMPAT_MAP.get(self._extract_model_base(), ())
 
+    @staticmethod
+    def _arp_scan_targets() -> List[Tuple[str, str]]:
+        """List (interface, network) pairs for each local IPv4 interface"""
         try:
-            # Try arp-scan if available
             result = subprocess.run(
-                ['arp-scan', '--localnet'],
+                ['ip', '-o', '-4', 'addr', 'show'],
                 capture_output=True,
                 text=True,
-                timeout=30
+                timeout=5
             )
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            return []
 
-            lg_tvs = []
-            for line in result.stdout.split('\n'):
-                if 'LG' in line.upper():
-                    parts = line.split('\t')
-                    if len(parts) >= 2:
-                        lg_tvs.append({
-                            'ip': parts[0],
-                            'mac': parts[1] if len(parts) > 1 else 'Unknown'
-                        })
+        targets = []
+        for line in result.stdout.splitlines():
+            # e.g. "2: eth0    inet 192.168.1.10/24 brd 192.168.1.255 ..."
+            parts = line.split()
+            if len(parts) < 4 or parts[2] != 'inet':
+                continue
+            network = ipaddress.ip_interface(parts[3]).network
+            if not network.is_loopback:
+                targets.append((parts[1], str(network)))
 
-            if lg_tvs:
-                logger.info(f"Found {len(lg_tvs)} LG TV(s)")
-                return lg_tvs[0] if lg_tvs else None
+        return targets
 
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            pass
+    def search_local_network(self) -> Optional[Dict]:
+        """Search for LG TVs on local network"""
+        logger.info("Scanning local network for LG TVs...")
+
+        # Scan each interface concurrently, or fall back to --localnet
+        commands = [
+            ['arp-scan', '-I', iface, cidr]
+            for iface, cidr in self._arp_scan_targets()
+        ] or [['arp-scan', '--localnet']]
+
+        lg_tvs = []
+        with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+            futures = [
+                executor.submit(subprocess.run, cmd, capture_output=True, timeout=15)
+                for cmd in commands
+            ]
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except (FileNotFoundError, subprocess.TimeoutExpired):
+                    continue
+
+                lg_tvs.extend(
+                    {'ip': ip.decode(), 'mac': mac.decode()}
+                    for ip, mac, _ in _ARP_LINE.findall(result.stdout)
+                )
+
+        if lg_tvs:
+            logger.info(f"Found {len(lg_tvs)} LG TV(s)")
+            return lg_tvs[0]
 
         logger.info("No LG TVs found on local network")
         return None
@@ -201,21 +323,33 @@ class FirmwareDatabase:
         '03.40.xx',
     ]
 
+    # Flattened lookups, built once at class definition
+    # Entries containing 'x' are wildcards ('4.x.x' matches any 4.N.N)
+    _ROOTABLE_EXACT = frozenset(
+        v for versions in ROOTABLE_FIRMWARE.values() for v in versions if 'x' not in v
+    )
+    _ROOTABLE_WILDCARDS = [
+        re.escape(v).replace('x', r'\d+')
+        for versions in ROOTABLE_FIRMWARE.values() for v in versions if 'x' in v
+    ]
+    _ROOTABLE_GLOB = (
+        re.compile('|'.join(_ROOTABLE_WILDCARDS)) if _ROOTABLE_WILDCARDS else None
+    )
+    _PATCHED_RE = re.compile(
+        '^(?:' + '|'.join(re.escape(p.rstrip('x')) for p in PATCHED_FIRMWARE) + ')'
+    )
+
     @classmethod
     def is_rootable(cls, version: str) -> bool:
         """Check if firmware version is rootable"""
-        for versions in cls.ROOTABLE_FIRMWARE.values():
-            if version in versions:
-                return True
-        return False
+        if version in cls._ROOTABLE_EXACT:
+            return True
+        return cls._ROOTABLE_GLOB is not None and bool(cls._ROOTABLE_GLOB.fullmatch(version))
 
     @classmethod
     def is_patched(cls, version: str) -> bool:
         """Check if firmware version has exploit patched"""
-        for patched in cls.PATCHED_FIRMWARE:
-            if version.startswith(patched.rstrip('x')):
-                return True
-        return False
+        return bool(cls._PATCHED_RE.match(version))
 
     @classmethod
     def recommend_firmware(cls, current_version: str) -> Optional[str]:
@@ -5,9 +5,12 @@ A graphical user interface for the LG TV firmware downgrade process
 """
 
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 import threading
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
 # Import our modules
@@ -15,6 +18,29 @@ from firmware_finder import FirmwareFinder, FirmwareDatabase
 from usb_prep import USBPrepper
 from ssh_helper import SSHHelper, TVDiscovery
 
+# Static UI text and fonts, built once at import
+_LBL_FONT = ('Arial', 10, 'bold')
+
+_SSH_INFO_TEXT = """
+SSH Port: 9922
+User: prisoner
+Password: (shown in Developer Mode app on TV)
+
+Prerequisites:
+✓ Developer Mode installed on TV
+✓ TV and PC on same network
+        """
+
+_WIZARD_METHOD_LABELS = (
+    "1️⃣  Web Browser Method\n(Easiest - No Dev Mode)",
+    "2️⃣  IPK File Method\n(Requires Developer Mode)",
+    "3️⃣  SSH Command Method\n(Advanced)",
+    "4️⃣  Prepare USB Only",
+)
+
+_DONATION_TEXT = """Donate XMR (Monero):
+46rAWWQKFvJc5A8mp2EVBDBPofTw2KUzgXtp89anAJT3S39e5szHa46X2PMwawznCTjdcq34AvU1Ra25MYjjPAGNK8T5Wfc"""
+
 
 class LGTVDowngradeGUI:
     """Main GUI application"""
@@ -37,6 +63,13 @@ class LGTVDowngradeGUI:
         self.tv_ip = tk.StringVar()
         self.log_text = tk.StringVar()
 
+        # Pending log lines, flushed to the widget in batches
+        self._log_buf = deque()
+        self._log_scheduled = False
+
+        # Network operations run here so they don't block the main loop
+        self._executor = ThreadPoolExecutor(max_workers=4)
+
         self.create_widgets()
         self.log("Welcome to LG TV Firmware Downgrade Utility!")
 
@@ -108,11 +141,11 @@ class LGTVDowngradeGUI:
         notebook.add(tab, text="📦 Firmware")
 
         # TV Model
-        ttk.Label(tab, text="TV Model:", font=('Arial', 10, 'bold')).grid(row=0, column=0, sticky='w', pady=5)
+        ttk.Label(tab, text="TV Model:", font=_LBL_FONT).grid(row=0, column=0, sticky='w', pady=5)
         ttk.Entry(tab, textvariable=self.tv_model, width=30).grid(row=0, column=1, pady=5, padx=5)
 
         # Target Firmware
-        ttk.Label(tab, text="Target Firmware:", font=('Arial', 10, 'bold')).grid(row=1, column=0, sticky='w', pady=5)
+        ttk.Label(tab, text="Target Firmware:", font=_LBL_FONT).grid(row=1, column=0, sticky='w', pady=5)
         ttk.Entry(tab, textvariable=self.target_firmware, width=30).grid(row=1, column=1, pady=5, padx=5)
 
         # Firmware Check
@@ -146,12 +179,12 @@ class LGTVDowngradeGUI:
         notebook.add(tab, text="🔌 USB Prep")
 
         # Firmware selection
-        ttk.Label(tab, text="Firmware File (.epk):", font=('Arial', 10, 'bold')).grid(row=0, column=0, sticky='w', pady=5)
+        ttk.Label(tab, text="Firmware File (.epk):", font=_LBL_FONT).grid(row=0, column=0, sticky='w', pady=5)
         ttk.Entry(tab, textvariable=self.firmware_path, width=40).grid(row=0, column=1, pady=5, padx=5)
         ttk.Button(tab, text="Browse...", command=self.browse_firmware).grid(row=0, column=2, pady=5)
 
         # USB selection
-        ttk.Label(tab, text="USB Drive:", font=('Arial', 10, 'bold')).grid(row=1, column=0, sticky='w', pady=5)
+        ttk.Label(tab, text="USB Drive:", font=_LBL_FONT).grid(row=1, column=0, sticky='w', pady=5)
         ttk.Entry(tab, textvariable=self.usb_path, width=40).grid(row=1, column=1, pady=5, padx=5)
         ttk.Button(tab, text="Browse...", command=self.browse_usb).grid(row=1, column=2, pady=5)
 
@@ -178,7 +211,7 @@ class LGTVDowngradeGUI:
         notebook.add(tab, text="📡 SSH")
 
         # TV IP
-        ttk.Label(tab, text="TV IP Address:", font=('Arial', 10, 'bold')).grid(row=0, column=0, sticky='w', pady=5)
+        ttk.Label(tab, text="TV IP Address:", font=_LBL_FONT).grid(row=0, column=0, sticky='w', pady=5)
         ttk.Entry(tab, textvariable=self.tv_ip, width=30).grid(row=0, column=1, pady=5, padx=5)
 
         # Buttons
@@ -207,17 +240,7 @@ class LGTVDowngradeGUI:
         info_frame = ttk.LabelFrame(tab, text="SSH Information", padding="10")
         info_frame.grid(row=2, column=0, columnspan=3, sticky='nsew', pady=10)
 
-        info_text = """
-SSH Port: 9922
-User: prisoner
-Password: (shown in Developer Mode app on TV)
-
-Prerequisites:
-✓ Developer Mode installed on TV
-✓ TV and PC on same network
-        """
-
-        ttk.Label(info_frame, text=info_text, justify='left').pack(fill='both', expand=True)
+        ttk.Label(info_frame, text=_SSH_INFO_TEXT, justify='left').pack(fill='both', expand=True)
 
     def create_wizard_tab(self, notebook):
         """Create wizard tab"""
@@ -236,58 +259,66 @@ Prerequisites:
         methods_frame = ttk.LabelFrame(tab, text="Choose Method", padding="15")
         methods_frame.pack(fill='both', expand=True, pady=10)
 
-        ttk.Button(
-            methods_frame,
-            text="1️⃣  Web Browser Method\n(Easiest - No Dev Mode)",
-            command=lambda: self.run_wizard_method(1),
-            width=40
-        ).pack(pady=10)
-
-        ttk.Button(
-            methods_frame,
-            text="2️⃣  IPK File Method\n(Requires Developer Mode)",
-            command=lambda: self.run_wizard_method(2),
-            width=40
-        ).pack(pady=10)
-
-        ttk.Button(
-            methods_frame,
-            text="3️⃣  SSH Command Method\n(Advanced)",
-            command=lambda: self.run_wizard_method(3),
-            width=40
-        ).pack(pady=10)
-
-        ttk.Button(
-            methods_frame,
-            text="4️⃣  Prepare USB Only",
-            command=lambda: self.run_wizard_method(4),
-            width=40
-        ).pack(pady=10)
+        for method, label in enumerate(_WIZARD_METHOD_LABELS, 1):
+            ttk.Button(
+                methods_frame,
+                text=label,
+                command=lambda m=method: self.run_wizard_method(m),
+                width=40
+            ).pack(pady=10)
 
         # Donation
         donation_frame = ttk.LabelFrame(tab, text="💖 Support This Project", padding="10")
         donation_frame.pack(fill='x', pady=10)
 
-        donation_text = """Donate XMR (Monero):
-46rAWWQKFvJc5A8mp2EVBDBPofTw2KUzgXtp89anAJT3S39e5szHa46X2PMwawznCTjdcq34AvU1Ra25MYjjPAGNK8T5Wfc"""
-
-        ttk.Label(donation_frame, text=donation_text, font=('Consolas', 8)).pack()
+        ttk.Label(donation_frame, text=_DONATION_TEXT, font=('Consolas', 8)).pack()
 
     def log(self, message):
         """Add message to log"""
-        self.log_output.insert('end', f"[{self.get_timestamp()}] {message}\n")
+        self._log_buf.append(f"[{self.get_timestamp()}] {message}\n")
+        if not self._log_scheduled:
+            self._log_scheduled = True
+            self.root.after(50, self._flush_log)
+
+    def _flush_log(self):
+        """Write all buffered log lines to the log widget in one insert"""
+        lines = []
+        while self._log_buf:
+            lines.append(self._log_buf.popleft())
+        self._log_scheduled = False
+
+        self.log_output.insert('end', ''.join(lines))
         self.log_output.see('end')
-        self.root.update()
 
     def get_timestamp(self):
         """Get current timestamp"""
-        from datetime import datetime
         return datetime.now().strftime("%H:%M:%S")
 
     def update_status(self, message):
         """Update status bar"""
         self.status_label.config(text=message)
-        self.root.update()
+        self.root.update_idletasks()
+
+    def run_in_background(self, func, on_done, *args):
+        """Run func in a worker thread, then call on_done(*args, result) on the Tk thread"""
+        future = self._executor.submit(func)
+
+        def done(f):
+            # Runs on the worker thread; hand the outcome to the Tk thread
+            try:
+                result = f.result()
+            except Exception as e:
+                self.root.after(0, self._on_background_error, e)
+            else:
+                self.root.after(0, on_done, *args, result)
+
+        future.add_done_callback(done)
+
+    def _on_background_error(self, error):
+        """Report a failed background task and reset the status bar"""
+        self.log(f"Error: {error}")
+        messagebox.showerror("Error", f"An error occurred:\n{error}")
+        self.update_status("Ready")
 
     # Button callbacks
     def browse_firmware(self):
@@ -303,7 +334,6 @@ Prerequisites:
     def browse_usb(self):
         """Browse for USB drive"""
         if sys.platform == 'win32':
-            from tkinter import simpledialog
             drive = simpledialog.askstring("USB Drive", "Enter drive letter (e.g., E:):")
             if drive:
                 self.usb_path.set(drive + "\\" if not drive.endswith(':') else drive)
@@ -316,18 +346,25 @@ Prerequisites:
         """Check if firmware is rootable"""
         version = self.target_firmware.get()
 
-        self.firmware_result.delete(1.0, 'end')
-
         if FirmwareDatabase.is_rootable(version):
-            self.firmware_result.insert('end', f"✓ Firmware {version} is ROOTABLE\n\n")
-            self.firmware_result.insert('end', "This version can be rooted using rootmy.tv\n")
+            msg = (
+                f"✓ Firmware {version} is ROOTABLE\n\n"
+                "This version can be rooted using rootmy.tv\n"
+            )
         elif FirmwareDatabase.is_patched(version):
-            self.firmware_result.insert('end', f"✗ Firmware {version} is PATCHED\n\n")
-            self.firmware_result.insert('end', "You need to downgrade to a rootable version.\n")
-            self.firmware_result.insert('end', f"Recommended: {FirmwareDatabase.recommend_firmware(version)}\n")
+            msg = (
+                f"✗ Firmware {version} is PATCHED\n\n"
+                "You need to downgrade to a rootable version.\n"
+                f"Recommended: {FirmwareDatabase.recommend_firmware(version)}\n"
+            )
         else:
-            self.firmware_result.insert('end', f"⚠ Unknown firmware version: {version}\n\n")
-            self.firmware_result.insert('end', "Check the RootMyTV website for compatibility.\n")
+            msg = (
+                f"⚠ Unknown firmware version: {version}\n\n"
+                "Check the RootMyTV website for compatibility.\n"
+            )
+
+        self.firmware_result.delete(1.0, 'end')
+        self.firmware_result.insert('end', msg)
 
         self.log(f"Checked firmware: {version}")
 
@@ -346,10 +383,11 @@ Prerequisites:
         self.log(f"Found {len(drives)} USB drive(s)")
 
         if drives:
-            msg = "Available USB Drives:\n\n"
-            for i, drive in enumerate(drives, 1):
-                msg += f"{i}. {drive.get('name', drive.get('path', 'Unknown'))}\n"
-                msg += f"   Path: {drive['path']}\n"
+            msg = "Available USB Drives:\n\n" + "".join(
+                f"{i}. {drive.get('name', drive.get('path', 'Unknown'))}\n"
+                f"   Path: {drive['path']}\n"
+                for i, drive in enumerate(drives, 1)
+            )
 
             messagebox.showinfo("USB Drives", msg)
         else:
@@ -397,7 +435,11 @@ Prerequisites:
         self.update_status("Testing connection...")
 
         ssh = SSHHelper(ip)
-        if ssh.test_connection():
+        self.run_in_background(ssh.test_connection, self._on_test_done, ip)
+
+    def _on_test_done(self, ip, connected):
+        """Report connection test result"""
+        if connected:
             messagebox.showinfo("Success", f"Connected to TV at {ip}")
             self.log(f"Connected to TV at {ip}")
         else:
@@ -420,7 +462,18 @@ Prerequisites:
         self.update_status("Sending command...")
 
         ssh = SSHHelper(ip)
-        if ssh.send_software_update():
+
+        def send():
+            try:
+                return ssh.send_software_update()
+            finally:
+                ssh.close()
+
+        self.run_in_background(send, self._on_update_sent)
+
+    def _on_update_sent(self, sent):
+        """Report software update command result"""
+        if sent:
             messagebox.showinfo(
                 "Success",
                 "Command sent!\nCheck your TV for the Software Update menu."
@@ -437,8 +490,10 @@ Prerequisites:
         self.update_status("Scanning network...")
         self.log("Scanning for LG TVs...")
 
-        devices = TVDiscovery.discover()
+        self.run_in_background(TVDiscovery.discover, self._on_scan_done)
 
+    def _on_scan_done(self, devices):
+        """Show discovery results"""
         if devices:
             msg = f"Found {len(devices)} device(s):\n\n"
             for ip in devices:
@@ -4,25 +4,41 @@ LG TV Firmware Downgrade Utility
 Automates the firmware downgrade process for LG webOS TVs
 """
 
+from __future__ import annotations
+
 import os
 import sys
+import shutil
 import argparse
 import logging
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('lgtv_downgrade.log'),
-        logging.StreamHandler()
-    ]
-)
+
+from firmware_finder import FirmwareFinder
+from usb_prep import USBPrepper
+from ssh_helper import SSHHelper
+
 logger = logging.getLogger(__name__)
 
 
+def configure_logging():
+    """Set up file and console logging (called once arguments are parsed)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('lgtv_downgrade.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+
+@lru_cache(maxsize=None)
+def _which(cmd: str) -> str | None:
+    """Cached shutil.which lookup"""
+    return shutil.which(cmd)
+
+
 class LGTVDowngrader:
     """Main class for LG TV firmware downgrade operations"""
 
@@ -32,39 +48,48 @@ class LGTVDowngrader:
         self.base_dir = Path(__file__).parent
         self.firmware_dir = self.base_dir / "firmware"
         self.firmware_dir.mkdir(exist_ok=True)
+        self._prerequisites_ok: bool | None = None
+        # Firmware paths already found, keyed by (tv_model, target_firmware)
+        self._firmware_cache: dict[tuple[str, str], str] = {}
+        # SSH helpers reused across calls, keyed by TV IP
+        self._ssh_cache: dict[str, SSHHelper] = {}
 
     def check_prerequisites(self) -> bool:
         """Check if all prerequisites are met"""
+        if self._prerequisites_ok is not None:
+            return self._prerequisites_ok
+
         logger.info("Checking prerequisites...")
 
         # Check for required commands
-        import shutil
         required_commands = ['ssh', 'scp']
-        missing = []
-
-        for cmd in required_commands:
-            if not shutil.which(cmd):
-                missing.append(cmd)
+        missing = [cmd for cmd in required_commands if not _which(cmd)]
 
         if missing:
             logger.error(f"Missing required commands: {', '.join(missing)}")
             logger.info("Please install OpenSSH client")
-            return False
+            self._prerequisites_ok = False
+        else:
+            logger.info("✓ All prerequisites met")
+            self._prerequisites_ok = True
 
-        logger.info("✓ All prerequisites met")
-        return True
+        return self._prerequisites_ok
 
-    def find_firmware(self) -> Optional[str]:
+    def find_firmware(self) -> str | None:
         """Find firmware for the specified TV model"""
-        logger.info(f"Searching firmware for {self.tv_model}...")
+        key = (self.tv_model, self.target_firmware)
+        cached = self._firmware_cache.get(key)
+        if cached and os.path.exists(cached):
+            return cached
 
-        from firmware_finder import FirmwareFinder
+        logger.info(f"Searching firmware for {self.tv_model}...")
 
         finder = FirmwareFinder(self.tv_model, self.target_firmware)
         firmware_path = finder.find_and_download()
 
         if firmware_path:
             logger.info(f"✓ Firmware found: {firmware_path}")
+            self._firmware_cache[key] = firmware_path
             return firmware_path
         else:
             logger.error("Firmware not found")
@@ -74,8 +99,6 @@ class LGTVDowngrader:
         """Prepare USB drive with firmware"""
         logger.info(f"Preparing USB drive at {usb_path}...")
 
-        from usb_prep import USBPrepper
-
         prepper = USBPrepper(usb_path)
         success = prepper.prepare_firmware(firmware_path)
 
@@ -86,13 +109,23 @@ class LGTVDowngrader:
             logger.error("Failed to prepare USB drive")
             return False
 
-    def connect_tv(self, tv_ip: str) -> bool:
+    def _get_ssh(self, tv_ip: str) -> SSHHelper:
+        """Get the shared SSH helper for a TV"""
+        if tv_ip not in self._ssh_cache:
+            self._ssh_cache[tv_ip] = SSHHelper(tv_ip)
+        return self._ssh_cache[tv_ip]
+
+    def close(self):
+        """Shut down the shared SSH connections opened by this downgrader"""
+        for ssh in self._ssh_cache.values():
+            ssh.close()
+        self._ssh_cache.clear()
+
+    def connect_tv(self, tv_ip: str, ssh: SSHHelper | None = None) -> bool:
         """Test connection to LG TV"""
         logger.info(f"Testing connection to TV at {tv_ip}...")
 
-        from ssh_helper import SSHHelper
-
-        ssh = SSHHelper(tv_ip)
+        ssh = ssh or self._get_ssh(tv_ip)
         if ssh.test_connection():
             logger.info("✓ Connected to TV")
             return True
@@ -100,13 +133,11 @@ class LGTVDowngrader:
             logger.error("Cannot connect to TV")
             return False
 
-    def send_downgrade_command(self, tv_ip: str) -> bool:
+    def send_downgrade_command(self, tv_ip: str, ssh: SSHHelper | None = None) -> bool:
         """Send downgrade command via SSH"""
         logger.info("Sending downgrade command to TV...")
 
-        from ssh_helper import SSHHelper
-
-        ssh = SSHHelper(tv_ip)
+        ssh = ssh or self._get_ssh(tv_ip)
         if ssh.send_software_update():
             logger.info("✓ Command sent successfully")
             logger.info("Please check your TV screen for the software update menu")
@@ -214,7 +245,8 @@ class LGTVDowngrader:
             logger.error("TV IP address is required")
             return
 
-        if not self.connect_tv(tv_ip):
+        ssh = self._get_ssh(tv_ip)
+        if not self.connect_tv(tv_ip, ssh):
             return
 
         firmware_path = self.find_firmware()
@@ -226,7 +258,7 @@ class LGTVDowngrader:
             self.prepare_usb(firmware_path, usb_path)
 
         if input("\n   Send downgrade command now? (y/n): ").strip().lower() == 'y':
-            self.send_downgrade_command(tv_ip)
+            self.send_downgrade_command(tv_ip, ssh)
 
     def method_usb_only(self):
         """Prepare USB only"""
@@ -273,6 +305,7 @@ Examples:
     parser.add_argument('--wizard', action='store_true', help='Run interactive wizard (default)')
 
     args = parser.parse_args()
+    configure_logging()
 
     # Default to wizard mode if no specific action requested
     if not any([args.usb, args.send_command, args.find_firmware]):
@@ -280,7 +313,10 @@ Examples:
 
     if args.wizard:
         downgrader = LGTVDowngrader('LG-43UP75006LF', '3.21.30')
-        downgrader.run_wizard()
+        try:
+            downgrader.run_wizard()
+        finally:
+            downgrader.close()
         return
 
     if not args.model or not args.firmware:
@@ -289,23 +325,27 @@ Examples:
 
     downgrader = LGTVDowngrader(args.model, args.firmware)
 
-    if args.find_firmware:
+    # Look the firmware up once and reuse it for USB preparation
+    firmware = None
+    if args.find_firmware or args.usb:
         firmware = downgrader.find_firmware()
-        if firmware:
+        if firmware and args.find_firmware:
             print(f"Firmware: {firmware}")
 
     if args.usb:
-        if not args.find_firmware:
-            logger.error("Use --find-firmware first")
+        if not firmware:
+            logger.error("Cannot prepare USB drive without firmware")
             sys.exit(1)
-        # We'd need the firmware path from find_firmware
-        downgrader.prepare_usb("", args.usb)
+        downgrader.prepare_usb(firmware, args.usb)
 
     if args.send_command:
         if not args.ip:
             logger.error("--ip is required for --send-command")
             sys.exit(1)
-        downgrader.send_downgrade_command(args.ip)
+        try:
+            downgrader.send_downgrade_command(args.ip)
+        finally:
+            downgrader.close()
 
 
 if __name__ == "__main__":
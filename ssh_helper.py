@@ -3,32 +3,147 @@ SSH Helper Module
 Connects to LG TVs and sends downgrade commands
 """
 
+from __future__ import annotations
+
+import atexit
+import errno
+import itertools
+import os
+import re
+import selectors
+import shutil
 import socket
 import subprocess
+import sys
+import tempfile
+import threading
 import time
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 
 logger = logging.getLogger(__name__)
 
+_IP_RE = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+
+# SSDP search for UPnP media renderers (LG TVs answer as one)
+_SSDP_ADDR = ('239.255.255.250', 1900)
+_SSDP_SEARCH = (
+    b'M-SEARCH * HTTP/1.1\r\n'
+    b'HOST: 239.255.255.250:1900\r\n'
+    b'MAN: "ssdp:discover"\r\n'
+    b'MX: 1\r\n'
+    b'ST: urn:schemas-upnp-org:device:MediaRenderer:1\r\n'
+    b'\r\n'
+)
+
+# connect_ex results meaning a non-blocking connect is under way;
+# Windows reports WSAEWOULDBLOCK (10035) rather than EINPROGRESS
+_CONNECT_PENDING = frozenset(
+    code for code in (
+        0, errno.EINPROGRESS, errno.EWOULDBLOCK,
+        getattr(errno, 'WSAEWOULDBLOCK', None)
+    ) if code is not None
+)
+
+# Private (0700) per-process directory for ssh ControlMaster sockets;
+# a predictable path in /tmp could be pre-created by another user
+_control_dir: str | None = None
+_control_dir_lock = threading.Lock()
+# Short socket names; the TV address may be an arbitrarily long hostname
+_control_ids = itertools.count()
+
+
+def _private_control_dir() -> str:
+    """Create the control socket directory on first use"""
+    global _control_dir
+    with _control_dir_lock:
+        if _control_dir is None:
+            # Short fixed base: sun_path is 104 bytes on macOS, and ssh appends
+            # a 17-character suffix while binding; $TMPDIR there is ~49 chars
+            _control_dir = tempfile.mkdtemp(prefix='lgtv-', dir='/tmp')
+            atexit.register(shutil.rmtree, _control_dir, True)
+        return _control_dir
+
+
+def probe(ip: str, port: int = 9922, timeout: float = 0.5) -> tuple[str, bool]:
+    """Check whether ip:port accepts TCP connections"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        return ip, sock.connect_ex((ip, port)) == 0
+
+
+def _scan_nonblocking(
+    ips: list[str],
+    port: int = 9922,
+    timeout: float = 0.5,
+    max_in_flight: int = 64
+) -> list[str]:
+    """Probe many addresses from a single thread, return the reachable ones"""
+    found = []
+    pending = iter(ips)
+
+    with selectors.DefaultSelector() as sel:
+
+        def start_next():
+            # Start a non-blocking connect to the next target, if any
+            for ip in pending:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                err = sock.connect_ex((ip, port))
+                if err in _CONNECT_PENDING:
+                    sel.register(sock, selectors.EVENT_WRITE, (ip, time.monotonic() + timeout))
+                    return
+                sock.close()
+
+        def finish(key, reachable):
+            sel.unregister(key.fileobj)
+            key.fileobj.close()
+            if reachable:
+                found.append(key.data[0])
+            start_next()
+
+        # Keep a bounded window of connects in flight so large scans
+        # don't exhaust file descriptors or select() limits
+        for _ in range(max_in_flight):
+            start_next()
+
+        while sel.get_map():
+            # A socket turns writable once its connect succeeds or fails
+            next_deadline = min(key.data[1] for key in sel.get_map().values())
+            for key, _ in sel.select(max(0.0, next_deadline - time.monotonic())):
+                sock = key.fileobj
+                finish(key, sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0)
+
+            # Drop probes that did not answer in time
+            now = time.monotonic()
+            for key in [k for k in sel.get_map().values() if k.data[1] <= now]:
+                finish(key, False)
+
+    return found
+
 
 class SSHHelper:
     """Helper for SSH connections to LG TV"""
 
-    def __init__(self, tv_ip: str, port: int = 9922):
+    def __init__(self, tv_ip: str, port: int = 9922, connect_timeout: float = 0.5):
         self.tv_ip = tv_ip
         self.port = port
+        # LAN round trips are a few ms, so a short probe timeout is plenty
+        self.connect_timeout = connect_timeout
         self.user = "prisoner"
 
+        # Share one SSH connection across commands (not supported on Windows)
+        if sys.platform == 'win32':
+            self._control_path = None
+        else:
+            self._control_path = os.path.join(_private_control_dir(), f"{next(_control_ids)}.sock")
+
     def test_connection(self) -> bool:
         """Test if TV is reachable on SSH port"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            result = sock.connect_ex((self.tv_ip, self.port))
-            sock.close()
+            _, reachable = probe(self.tv_ip, self.port, self.connect_timeout)
 
-            if result == 0:
+            if reachable:
                 logger.info(f"✓ TV is reachable at {self.tv_ip}:{self.port}")
                 return True
             else:
@@ -42,73 +157,160 @@ class SSHHelper:
             logger.error(f"Connection test failed: {e}")
             return False
 
+    # luna-send commands understood by the TV
+    SOFTWARE_UPDATE_CMD = (
+        'luna-send-pub -d -n 1 -f '
+        '"luna://com.webos.applicationManager/launch" '
+        '\'{"id": "com.webos.app.softwareupdate", '
+        '"params": {"mode": "user", "flagUpdate": true}}\''
+    )
+    EXPERT_MODE_CMD = (
+        'luna-send-pub -d -n 1 -f '
+        '"luna://com.webos.applicationManager/launch" '
+        '\'{"id": "com.webos.app.softwareupdate", '
+        '"params": {"mode": "expert", "flagUpdate": true}}\''
+    )
+    FIRMWARE_INFO_CMD = 'luna-send-pub -n 1 "luna://com.webos.service.tvproperty/getSystemInfo" \'{}\''
+    LIST_APPS_CMD = 'luna-send-pub -n 1 "luna://com.webos.applicationManager/listApps" \'{}\''
+
+    # Marker echoed between batched commands to split their output
+    _BATCH_SEP = '__LGTV_BATCH_SEP__'
+
     def send_software_update(self) -> bool:
         """Send luna command to open Software Update"""
-        command = (
-            'luna-send-pub -d -n 1 -f '
-            '"luna://com.webos.applicationManager/launch" '
-            '\'{"id": "com.webos.app.softwareupdate", '
-            '"params": {"mode": "user", "flagUpdate": true}}\''
-        )
-
-        return self._execute_command(command)
+        return self._execute_command(self.SOFTWARE_UPDATE_CMD)
 
     def send_expert_mode(self) -> bool:
         """Send luna command to open Expert Mode"""
-        command = (
-            'luna-send-pub -d -n 1 -f '
-            '"luna://com.webos.applicationManager/launch" '
-            '\'{"id": "com.webos.app.softwareupdate", '
-            '"params": {"mode": "expert", "flagUpdate": true}}\''
-        )
-
-        return self._execute_command(command)
+        return self._execute_command(self.EXPERT_MODE_CMD)
 
-    def get_firmware_info(self) -> Optional[str]:
+    def get_firmware_info(self) -> str | None:
         """Get current firmware version"""
-        command = 'luna-send-pub -n 1 "luna://com.webos.service.tvproperty/getSystemInfo" \'{}\''
-
-        result = self._execute_command(command, capture_output=True)
+        result = self._execute_command(self.FIRMWARE_INFO_CMD, capture_output=True)
         return result if result else None
 
     def check_developer_mode(self) -> bool:
         """Check if Developer Mode is installed"""
-        command = 'luna-send-pub -n 1 "luna://com.webos.applicationManager/listApps" \'{}\''
+        # listApps output can be large; stop reading at the first match
+        return self._search_output(self.LIST_APPS_CMD, b'developer')
 
-        result = self._execute_command(command, capture_output=True)
-        if result and 'developer' in result.lower():
-            return True
-        return False
+    @staticmethod
+    def _has_developer_app(list_apps_output: str | None) -> bool:
+        """Check listApps output for the Developer Mode app"""
+        if not list_apps_output:
+            return False
+        return 'developer' in list_apps_output.lower()
 
-    def _execute_command(self, command: str, capture_output: bool = False) -> Optional[str]:
-        """Execute SSH command"""
+    def execute_batch(self, commands: list[str]) -> list[str] | None:
+        """Run several commands in one SSH session, returning each command's output"""
+        script = f'; echo {self._BATCH_SEP}; '.join(commands)
 
-        # Build SSH command
+        output = self._execute_command(script, capture_output=True)
+        if output is None:
+            return None
+
+        return output.split(f'{self._BATCH_SEP}\n')
+
+    def get_status(self) -> tuple[str, bool] | None:
+        """Get firmware info and Developer Mode state in one SSH session"""
+        outputs = self.execute_batch([self.FIRMWARE_INFO_CMD, self.LIST_APPS_CMD])
+        if not outputs or len(outputs) != 2:
+            return None
+
+        info, apps = outputs
+        return info, self._has_developer_app(apps)
+
+    def _ssh_command(self, command: str) -> list[str]:
+        """Build the ssh argument list for a remote command"""
         ssh_cmd = [
             'ssh',
             '-p', str(self.port),
             '-o', 'StrictHostKeyChecking=no',
             '-o', 'UserKnownHostsFile=/dev/null',
             '-o', 'ConnectTimeout=10',
-            f'{self.user}@{self.tv_ip}',
-            command
         ]
 
+        if self._control_path:
+            ssh_cmd += [
+                '-o', 'ControlMaster=auto',
+                '-o', f'ControlPath={self._control_path}',
+                '-o', 'ControlPersist=60s',
+            ]
+
+        ssh_cmd += [f'{self.user}@{self.tv_ip}', command]
+        return ssh_cmd
+
+    def _search_output(self, command: str, needle: bytes) -> bool:
+        """Stream a command's output and stop as soon as needle appears (case-insensitive)"""
+        needle = needle.lower()
+        overlap = len(needle) - 1
+
+        try:
+            logger.info(f"Executing command via SSH...")
+
+            with tempfile.TemporaryFile() as err, subprocess.Popen(
+                self._ssh_command(command),
+                stdout=subprocess.PIPE,
+                stderr=err
+            ) as proc:
+                timed_out = threading.Event()
+
+                def kill():
+                    timed_out.set()
+                    proc.kill()
+
+                timer = threading.Timer(30, kill)
+                timer.start()
+                try:
+                    # Only look at the new chunk plus enough of the previous
+                    # one to catch a match split across reads
+                    tail = b''
+                    for chunk in iter(lambda: proc.stdout.read1(4096), b''):
+                        window = tail + chunk.lower()
+                        if needle in window:
+                            proc.terminate()
+                            return True
+                        tail = window[-overlap:] if overlap else b''
+                finally:
+                    timer.cancel()
+
+                proc.wait()
+                if timed_out.is_set():
+                    logger.error("Command timed out")
+                elif proc.returncode != 0:
+                    err.seek(0)
+                    logger.error(f"Command failed: {err.read().decode(errors='replace').strip()}")
+
+            return False
+
+        except FileNotFoundError:
+            logger.error("SSH client not found. Please install OpenSSH.")
+            return False
+
+    def _execute_command(self, command: str, capture_output: bool = False) -> str | None:
+        """Execute SSH command"""
+        ssh_cmd = self._ssh_command(command)
+
         try:
             logger.info(f"Executing command via SSH...")
 
             if capture_output:
-                result = subprocess.run(
+                with subprocess.Popen(
                     ssh_cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-
-                if result.returncode == 0:
-                    return result.stdout
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                ) as proc:
+                    try:
+                        out, err = proc.communicate(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+                        proc.communicate()
+                        raise
+
+                if proc.returncode == 0:
+                    return out.decode(errors='replace')
                 else:
-                    logger.error(f"Command failed: {result.stderr}")
+                    logger.error(f"Command failed: {err.decode(errors='replace')}")
                     return None
             else:
                 subprocess.run(ssh_cmd, check=True, timeout=30)
@@ -124,6 +326,24 @@ class SSHHelper:
             logger.error("SSH client not found. Please install OpenSSH.")
             return None
 
+    def close(self):
+        """Shut down the shared SSH connection, if one is open"""
+        if not self._control_path:
+            return
+
+        try:
+            subprocess.run(
+                [
+                    'ssh', '-O', 'exit',
+                    '-o', f'ControlPath={self._control_path}',
+                    f'{self.user}@{self.tv_ip}'
+                ],
+                capture_output=True,
+                timeout=10
+            )
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            pass
+
 
 class SSHConnectionWizard:
     """Interactive wizard for SSH connection setup"""
@@ -175,32 +395,43 @@ Prerequisites:
         print("   2. Send Expert Mode command")
         print("   3. Get firmware info")
         print("   4. Check Developer Mode")
+        print("   5. Get firmware info and check Developer Mode")
 
-        choice = input("\n   Choice (1-4): ").strip()
-
-        if choice == "1":
-            if ssh.send_software_update():
-                print("\n✓ Software Update command sent!")
-                print("   Check your TV for the Software Update menu")
-        elif choice == "2":
-            if ssh.send_expert_mode():
-                print("\n✓ Expert Mode command sent!")
-                print("   Check your TV for the Software Update menu")
-        elif choice == "3":
-            info = ssh.get_firmware_info()
-            if info:
-                print(f"\n✓ Firmware info:\n{info}")
-        elif choice == "4":
-            if ssh.check_developer_mode():
-                print("\n✓ Developer Mode is installed")
-            else:
-                print("\n❌ Developer Mode not found")
+        choice = input("\n   Choice (1-5): ").strip()
+
+        try:
+            if choice == "1":
+                if ssh.send_software_update():
+                    print("\n✓ Software Update command sent!")
+                    print("   Check your TV for the Software Update menu")
+            elif choice == "2":
+                if ssh.send_expert_mode():
+                    print("\n✓ Expert Mode command sent!")
+                    print("   Check your TV for the Software Update menu")
+            elif choice == "3":
+                info = ssh.get_firmware_info()
+                if info:
+                    print(f"\n✓ Firmware info:\n{info}")
+            elif choice == "4":
+                if ssh.check_developer_mode():
+                    print("\n✓ Developer Mode is installed")
+                else:
+                    print("\n❌ Developer Mode not found")
+            elif choice == "5":
+                status = ssh.get_status()
+                if status:
+                    info, dev_mode = status
+                    print(f"\n✓ Firmware info:\n{info}")
+                    if dev_mode:
+                        print("\n✓ Developer Mode is installed")
+                    else:
+                        print("\n❌ Developer Mode not found")
+        finally:
+            ssh.close()
 
     @staticmethod
     def scan_network():
         """Scan local network for LG TVs"""
-        import ipaddress
-
         print("\n🔍 Scanning local network for LG TVs...")
 
         # Get local network range
@@ -211,16 +442,12 @@ Prerequisites:
             local_ip = s.getsockname()[0]
             s.close()
 
-            network = ipaddress.IPv4Network(f"{local_ip}/24", strict=False)
+            prefix = '.'.join(local_ip.split('.')[:3])
 
-            print(f"   Scanning network: {network}")
+            print(f"   Scanning network: {prefix}.0/24")
 
-            found = []
-            # Scan common IPs (limit to save time)
-            for i in range(1, 255):
-                ip = str(network.network_address + i)
-                if SSHHelper(ip).test_connection():
-                    found.append(ip)
+            # Probe all targets at once with non-blocking sockets
+            found = _scan_nonblocking(TVDiscovery._scan_targets(prefix))
 
             if found:
                 print(f"\n✓ Found {len(found)} device(s):")
@@ -239,21 +466,39 @@ Prerequisites:
 class TVDiscovery:
     """Discover LG TVs on the local network"""
 
-    @staticmethod
-    def discover() -> list:
-        """Discover LG TVs using various methods"""
-        devices = []
+    # (timestamp, devices) from the last discovery run
+    _cache = (0.0, None)
+    _CACHE_TTL = 2.0
 
-        # Method 1: Check common mDNS/Bonjour services
-        devices.extend(TVDiscovery._check_mdns())
-
-        # Method 2: Scan common LG TV ports
-        devices.extend(TVDiscovery._scan_ports())
+    @classmethod
+    def discover(cls) -> list:
+        """Discover LG TVs using various methods"""
+        now = time.monotonic()
+        ts, devices = cls._cache
+        if devices is not None and now - ts < cls._CACHE_TTL:
+            return devices
 
-        # Method 3: UPnP discovery
-        devices.extend(TVDiscovery._upnp_discover())
+        devices = cls._discover()
+        cls._cache = (time.monotonic(), devices)
+        return devices
 
-        return list(set(devices))  # Remove duplicates
+    @staticmethod
+    def _discover() -> list:
+        """Run all discovery methods"""
+        found = set()
+
+        # mDNS, UPnP and the port scan are independent and I/O-bound, so
+        # run them side by side; total time is the slowest one, not the sum
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(TVDiscovery._check_mdns),
+                executor.submit(TVDiscovery._upnp_discover),
+                executor.submit(TVDiscovery._scan_ports),
+            ]
+            for future in as_completed(futures):
+                found.update(future.result())
+
+        return sorted(found)
 
     @staticmethod
     def _check_mdns() -> list:
@@ -263,10 +508,8 @@ class TVDiscovery:
         try:
             # Try to resolve LG TV hostname
             # LG TVs often use hostname like LgWebOS_TV_*
-            import subprocess
-
             result = subprocess.run(
-                ['avahi-browse', '-_r', '-t', '_workstation._tcp'],
+                ['avahi-browse', '-p', '-r', '-t', '_workstation._tcp'],
                 capture_output=True,
                 text=True,
                 timeout=10
@@ -274,16 +517,21 @@ class TVDiscovery:
 
             for line in result.stdout.split('\n'):
                 if 'LG' in line.upper() or 'WEBOS' in line.upper():
-                    # Extract IP from line
-                    parts = line.split(';')
-                    if len(parts) > 2:
-                        devices.append(parts[2])
+                    # Extract IP from resolved ("=;...") lines
+                    ip_match = _IP_RE.search(line)
+                    if ip_match:
+                        devices.append(ip_match.group(0))
 
         except (FileNotFoundError, subprocess.TimeoutExpired):
             pass
 
         return devices
 
+    @staticmethod
+    def _scan_targets(prefix: str) -> list[str]:
+        """Every host address in the prefix's /24"""
+        return [f"{prefix}.{i}" for i in range(1, 255)]
+
     @staticmethod
     def _scan_ports() -> list:
         """Scan for LG TV SSH port (9922)"""
@@ -296,12 +544,9 @@ class TVDiscovery:
             local_ip = s.getsockname()[0]
             s.close()
 
-            # Scan common range (first 100 IPs)
+            # Probe all targets at once with non-blocking sockets
             prefix = '.'.join(local_ip.split('.')[:3])
-            for i in range(1, 100):
-                ip = f"{prefix}.{i}"
-                if SSHHelper(ip).test_connection():
-                    devices.append(ip)
+            devices = _scan_nonblocking(TVDiscovery._scan_targets(prefix))
 
         except Exception:
             pass
@@ -309,29 +554,35 @@ class TVDiscovery:
         return devices
 
     @staticmethod
-    def _upnp_discover() -> list:
-        """Discover devices using UPnP"""
+    def _upnp_discover(timeout: float = 2.0) -> list:
+        """Discover devices using an SSDP M-SEARCH multicast"""
         devices = []
 
         try:
-            import subprocess
-
-            result = subprocess.run(
-                ['upnpc', '-l'],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-
-            for line in result.stdout.split('\n'):
-                if 'LG' in line.upper():
-                    # Extract IP if present
-                    import re
-                    ip_match = re.search(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', line)
-                    if ip_match:
-                        devices.append(ip_match.group(0))
-
-        except (FileNotFoundError, subprocess.TimeoutExpired):
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP) as sock:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+                sock.sendto(_SSDP_SEARCH, _SSDP_ADDR)
+
+                # Collect replies until the deadline
+                deadline = time.monotonic() + timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    sock.settimeout(remaining)
+                    try:
+                        data, (ip, _) = sock.recvfrom(2048)
+                    except socket.timeout:
+                        break
+
+                    for line in data.split(b'\r\n'):
+                        if line[:7].upper() == b'SERVER:':
+                            server = line.upper()
+                            if (b'LG' in server or b'WEBOS' in server) and ip not in devices:
+                                devices.append(ip)
+                            break
+
+        except OSError:
             pass
 
         return devices
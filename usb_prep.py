@@ -4,28 +4,267 @@ Prepares USB drives with firmware for LG TV downgrade
 """
 
 import os
+import re
+import json
+import mmap
+import sys
 import shutil
 import platform
+import queue
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, List
 import logging
 
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+# Resolved once; platform.system() never changes within a process
+_SYSTEM = platform.system()
+
+_WIZARD_BANNER = """
+╔═══════════════════════════════════════════════════════════════╗
+║              USB Drive Preparation Wizard                     ║
+╚═══════════════════════════════════════════════════════════════╝
+
+"""
+
+_SUMMARY_TEMPLATE = """
+═══════════════════════════════════════════════════════════════
+                    USB PREPARATION COMPLETE
+═══════════════════════════════════════════════════════════════
+
+📁 USB Path:     {usb_path}
+📦 Firmware:     {name}
+📏 Size:         {size_mb:.1f} MB
+📂 Location:     LG_DTV/{name}
+
+═══════════════════════════════════════════════════════════════
+
+✓ Your USB drive is ready!
+
+Next steps:
+1. Safely eject the USB drive
+2. Plug it into your LG TV
+3. Follow your chosen downgrade method
+
+═══════════════════════════════════════════════════════════════
+"""
+
+_COPY_BUFSIZE = 4 * 1024 * 1024
+_MMAP_CHUNK = 8 * 1024 * 1024
+
+# CopyFileExW flag and the error older Windows returns for it
+_COPY_FILE_NO_BUFFERING = 0x00001000
+_ERROR_INVALID_PARAMETER = 87
+
+# Mount point prefixes where removable drives usually appear
+_MEDIA_PREFIXES = ('/media/', '/mnt/', '/run/media/')
+_MOUNT_ESCAPE = re.compile(rb'\\([0-7]{3})')
+
+
+def _fast_copy(src: str, dst: str):
+    """Copy file data in-kernel where possible, keeping the source timestamps"""
+    # Opening dst truncates it, so refuse to copy a file onto itself (as copy2 does)
+    try:
+        if os.path.samefile(src, dst):
+            raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    except FileNotFoundError:
+        pass
+
+    if sys.platform == 'win32':
+        _fast_copy_windows(src, dst)
+        return
+
+    in_fd = os.open(src, os.O_RDONLY)
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            # Read the source once, front to back; don't keep it cached
+            os.posix_fadvise(in_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(in_fd, 0, 0, os.POSIX_FADV_NOREUSE)
+
+        out_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            src_stat = os.fstat(in_fd)
+            remaining = src_stat.st_size
+            offset = 0
+
+            # copy_file_range (Linux 4.5+), then sendfile (Linux 2.6.33+);
+            # macOS sendfile only writes to sockets so it goes straight to the loop
+            for fast in ('copy_file_range', 'sendfile'):
+                if remaining == 0 or not sys.platform.startswith('linux'):
+                    break
+                if not hasattr(os, fast):
+                    continue
+                try:
+                    while remaining:
+                        if fast == 'copy_file_range':
+                            n = os.copy_file_range(in_fd, out_fd, remaining)
+                        else:
+                            n = os.sendfile(out_fd, in_fd, offset, remaining)
+                        if n == 0:
+                            break
+                        offset += n
+                        remaining -= n
+                except OSError as e:
+                    if offset:
+                        raise
+                    logger.debug(f"{fast} unavailable, falling back: {e}")
+
+            if offset == 0 and remaining and _SYSTEM == 'Darwin':
+                # No copy_file_range and no file-to-file sendfile on macOS
+                _copy_mmap(in_fd, out_fd, remaining)
+            elif offset == 0:
+                _copy_double_buffered(in_fd, out_fd)
+            elif remaining:
+                raise OSError(f"Short copy: {remaining} bytes not written")
+
+            # The user ejects right after this, so the data must be on the drive
+            os.fsync(out_fd)
+
+            if hasattr(os, 'posix_fadvise'):
+                # The drive is about to be ejected; drop its pages from the cache
+                os.posix_fadvise(out_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(out_fd)
+    finally:
+        os.close(in_fd)
+
+    # Only the timestamps matter; FAT32 can't hold mode bits or xattrs
+    os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    _fsync_dir(os.path.dirname(dst))
+
+
+def _spawn(argv: List[str], quiet: bool = False) -> int:
+    """Run a command via posix_spawn (no fork page-table copy) and wait for it"""
+    file_actions = []
+    if quiet:
+        file_actions.append((os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0))
+    pid = os.posix_spawnp(argv[0], argv, os.environ, file_actions=file_actions)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+def _fsync_dir(path: str):
+    """Flush a directory so a newly created entry survives removal"""
+    try:
+        dir_fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError as e:
+        logger.debug(f"Could not open {path} for fsync: {e}")
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError as e:
+        # Some filesystems reject fsync on directories
+        logger.debug(f"Could not fsync {path}: {e}")
+    finally:
+        os.close(dir_fd)
+
+
+def _fast_copy_windows(src: str, dst: str):
+    """Copy with CopyFileExW, bypassing the system cache where supported"""
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.CopyFileExW.argtypes = (
+        wintypes.LPCWSTR, wintypes.LPCWSTR, ctypes.c_void_p,
+        ctypes.c_void_p, ctypes.c_void_p, wintypes.DWORD
+    )
+    kernel32.CopyFileExW.restype = wintypes.BOOL
+
+    if kernel32.CopyFileExW(src, dst, None, None, None, _COPY_FILE_NO_BUFFERING):
+        return
+
+    error = ctypes.get_last_error()
+    if error != _ERROR_INVALID_PARAMETER:
+        raise ctypes.WinError(error)
+
+    # Unbuffered copies need Windows 8+; plain CopyFileW goes through the cache
+    logger.debug("COPY_FILE_NO_BUFFERING not supported, using CopyFileW")
+    if not kernel32.CopyFileW(src, dst, False):
+        raise ctypes.WinError(ctypes.get_last_error())
+
+
+def _copy_mmap(in_fd: int, out_fd: int, size: int):
+    """Write a memory-mapped source out in large slabs"""
+    with mmap.mmap(in_fd, size, prot=mmap.PROT_READ) as mm:
+        for advice in ('MADV_SEQUENTIAL', 'MADV_WILLNEED'):
+            if hasattr(mmap, advice):
+                mm.madvise(getattr(mmap, advice))
+
+        with memoryview(mm) as view:
+            offset = 0
+            while offset < size:
+                offset += os.write(out_fd, view[offset:offset + _MMAP_CHUNK])
+
+
+def _copy_double_buffered(in_fd: int, out_fd: int):
+    """Copy between descriptors, reading the next block while the last one is written"""
+    free = queue.Queue()
+    filled = queue.Queue()
+    for _ in range(2):
+        free.put(bytearray(_COPY_BUFSIZE))
+    errors = []
+
+    def writer():
+        # Keep draining after a failure so the reader never blocks on free.get()
+        while True:
+            buf, n = filled.get()
+            if buf is None:
+                return
+            if not errors:
+                try:
+                    view = memoryview(buf)
+                    written = 0
+                    while written < n:
+                        written += os.write(out_fd, view[written:n])
+                except OSError as e:
+                    errors.append(e)
+            free.put(buf)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        while not errors:
+            buf = free.get()
+            n = os.readv(in_fd, [buf])
+            if n == 0:
+                break
+            filled.put((buf, n))
+    finally:
+        filled.put((None, 0))
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
 
 class USBPrepper:
     """Prepare USB drives for LG TV firmware downgrade"""
 
+    # (timestamp, drives) from the last enumeration
+    _cache = (0.0, None)
+    _CACHE_TTL = 2.0
+
     def __init__(self, usb_path: str):
         self.usb_path = usb_path
-        self.system = platform.system()
+        self.system = _SYSTEM
 
     def prepare_firmware(self, firmware_path: str) -> bool:
         """Prepare USB drive with firmware file"""
 
         # Validate firmware
-        if not Path(firmware_path).exists():
+        try:
+            src_stat = os.stat(firmware_path)
+        except FileNotFoundError:
             logger.error(f"Firmware not found: {firmware_path}")
             return False
 
@@ -38,69 +277,78 @@ class USBPrepper:
         lg_dtv_path = os.path.join(self.usb_path, "LG_DTV")
 
         try:
-            os.makedirs(lg_dtv_path, exist_ok=True)
+            os.mkdir(lg_dtv_path)
             logger.info(f"Created LG_DTV folder: {lg_dtv_path}")
-        except Exception as e:
+        except FileExistsError:
+            pass
+        except OSError as e:
             logger.error(f"Failed to create LG_DTV folder: {e}")
             return False
 
         # Copy firmware
-        firmware_name = Path(firmware_path).name
+        firmware_name = os.path.basename(firmware_path)
         dest_path = os.path.join(lg_dtv_path, firmware_name)
 
         try:
-            shutil.copy2(firmware_path, dest_path)
-            size_mb = Path(firmware_path).stat().st_size / (1024 * 1024)
+            _fast_copy(firmware_path, dest_path)
+            size_mb = src_stat.st_size / (1024 * 1024)
             logger.info(f"Copied firmware ({size_mb:.1f}MB): {dest_path}")
         except Exception as e:
             logger.error(f"Failed to copy firmware: {e}")
             return False
 
-        # Verify
-        if not os.path.exists(dest_path):
+        # Verify: fsync only proves the flush worked, not that all bytes arrived
+        try:
+            copied = os.stat(dest_path).st_size == src_stat.st_size
+        except FileNotFoundError:
+            copied = False
+        if not copied:
             logger.error("Verification failed - file not copied")
             return False
 
         logger.info("✓ USB drive prepared successfully")
-        self._print_summary(dest_path)
+        self.invalidate_drive_cache()
+        self._print_summary(dest_path, src_stat.st_size)
         return True
 
-    def _print_summary(self, firmware_path: str):
+    def _print_summary(self, firmware_path: str, size: int):
         """Print preparation summary"""
-        size_mb = Path(firmware_path).stat().st_size / (1024 * 1024)
+        size_mb = size / (1024 * 1024)
 
-        print(f"""
-═══════════════════════════════════════════════════════════════
-                    USB PREPARATION COMPLETE
-═══════════════════════════════════════════════════════════════
-
-📁 USB Path:     {self.usb_path}
-📦 Firmware:     {Path(firmware_path).name}
-📏 Size:         {size_mb:.1f} MB
-📂 Location:     LG_DTV/{Path(firmware_path).name}
+        # print() is a no-op when there is no console (pythonw, GUI launch)
+        print(_SUMMARY_TEMPLATE.format(
+            usb_path=self.usb_path,
+            name=os.path.basename(firmware_path),
+            size_mb=size_mb
+        ), end='', flush=True)
 
-═══════════════════════════════════════════════════════════════
+    @classmethod
+    def list_usb_drives(cls) -> List[dict]:
+        """List available USB drives on the system"""
+        now = time.monotonic()
+        ts, drives = cls._cache
+        if drives is not None and now - ts < cls._CACHE_TTL:
+            return drives
 
-✓ Your USB drive is ready!
+        drives = cls._enumerate_drives()
+        cls._cache = (time.monotonic(), drives)
+        return drives
 
-Next steps:
-1. Safely eject the USB drive
-2. Plug it into your LG TV
-3. Follow your chosen downgrade method
-
-═══════════════════════════════════════════════════════════════
-        """)
+    @classmethod
+    def invalidate_drive_cache(cls):
+        """Force the next list_usb_drives call to re-enumerate"""
+        cls._cache = (0.0, None)
 
     @staticmethod
-    def list_usb_drives() -> List[dict]:
-        """List available USB drives on the system"""
+    def _enumerate_drives() -> List[dict]:
+        """Enumerate USB drives for the current platform"""
         drives = []
 
-        if platform.system() == "Windows":
+        if _SYSTEM == "Windows":
             drives = USBPrepper._list_windows_drives()
-        elif platform.system() == "Linux":
+        elif _SYSTEM == "Linux":
             drives = USBPrepper._list_linux_drives()
-        elif platform.system() == "Darwin":
+        elif _SYSTEM == "Darwin":
             drives = USBPrepper._list_macos_drives()
 
         return drives
@@ -111,38 +359,59 @@ Next steps:
         import win32file
         import win32api
 
-        drives = []
-        for drive in win32file.GetLogicalDriveStrings().split('\x00'):
-            if drive:
-                drive_type = win32file.GetDriveType(drive)
-                if drive_type == win32file.DRIVE_REMOVABLE:
-                    try:
-                        free = win32file.GetDiskFreeSpaceEx(drive)
-                        drives.append({
-                            'path': drive,
-                            'name': win32api.GetVolumeInformation(drive + '\\')[0],
-                            'free_gb': free[0] // (1024**3),
-                            'type': 'Removable'
-                        })
-                    except:
-                        drives.append({'path': drive, 'type': 'Removable'})
-        return drives
+        candidates = []
+        # One bit per assigned drive letter, bit 0 = A:
+        mask = win32api.GetLogicalDrives()
+        for i in range(26):
+            if not (mask >> i) & 1:
+                continue
+            drive = f"{chr(ord('A') + i)}:\\"
+            # Only query the slow volume APIs for removable drives
+            if win32file.GetDriveType(drive) == win32file.DRIVE_REMOVABLE:
+                candidates.append(drive)
+
+        if not candidates:
+            return []
+
+        # Sleeping drives can take a while to spin up, so query them together
+        with ThreadPoolExecutor(max_workers=min(8, len(candidates))) as executor:
+            return list(executor.map(USBPrepper._fetch_drive_info, candidates))
+
+    @staticmethod
+    def _fetch_drive_info(drive: str) -> dict:
+        """Query free space and volume label for one Windows drive"""
+        import win32file
+        import win32api
+
+        try:
+            free = win32file.GetDiskFreeSpaceEx(drive)
+            return {
+                'path': drive,
+                'name': win32api.GetVolumeInformation(drive)[0],
+                'free_gb': free[0] // (1024**3),
+                'type': 'Removable'
+            }
+        except:
+            return {'path': drive, 'type': 'Removable'}
 
     @staticmethod
     def _list_linux_drives() -> List[dict]:
         """List USB drives on Linux"""
         drives = []
 
-        try:
-            # Use lsblk to list drives
-            result = subprocess.run(
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # Use lsblk to list drives, reading the mount table meanwhile
+            lsblk = executor.submit(
+                subprocess.run,
                 ['lsblk', '-o', 'NAME,SIZE,TYPE,MOUNTPOINT', '-J'],
                 capture_output=True,
-                text=True
+                timeout=5
             )
+            mounted = USBPrepper._scan_common_mounts()
 
-            import json
-            data = json.loads(result.stdout)
+        try:
+            # Both parsers accept the raw bytes, so skip decoding to str first
+            data = _loads(lsblk.result().stdout)
 
             for device in data.get('blockdevices', []):
                 if device.get('type') == 'disk' and device.get('mountpoint'):
@@ -157,31 +426,57 @@ Next steps:
             logger.debug(f"Could not list drives: {e}")
 
         # Fallback: check common mount points
-        common_mounts = ['/media/', '/mnt/', '/run/media/']
-        for mount in common_mounts:
-            if os.path.exists(mount):
-                for root, dirs, _ in os.walk(mount):
-                    for d in dirs:
-                        full_path = os.path.join(root, d)
-                        if os.path.ismount(full_path):
-                            drives.append({'path': full_path, 'type': 'USB'})
-                    break
+        drives.extend(mounted)
 
         return drives
 
+    @staticmethod
+    def _scan_common_mounts() -> List[dict]:
+        """List mounts under the usual removable-media prefixes"""
+        try:
+            with open('/proc/self/mounts', 'rb') as f:
+                lines = f.read().split(b'\n')
+        except OSError as e:
+            logger.debug(f"Could not read mount table: {e}")
+            return USBPrepper._walk_common_mounts()
+
+        drives = []
+        for line in lines:
+            parts = line.split(b' ', 2)
+            if len(parts) < 2:
+                continue
+            # The kernel escapes space, tab, newline and backslash as \ooo
+            mount_point = os.fsdecode(_MOUNT_ESCAPE.sub(
+                lambda m: bytes((int(m.group(1), 8),)), parts[1]
+            ))
+            if mount_point.startswith(_MEDIA_PREFIXES):
+                drives.append({'path': mount_point, 'type': 'USB'})
+        return drives
+
+    @staticmethod
+    def _walk_common_mounts() -> List[dict]:
+        """Find mount points directly under the media prefixes without /proc"""
+        drives = []
+        for mount in _MEDIA_PREFIXES:
+            try:
+                parent_dev = os.stat(mount).st_dev
+                with os.scandir(mount) as it:
+                    for entry in it:
+                        # d_type answers is_dir(); one lstat per directory after that
+                        if (entry.is_dir(follow_symlinks=False)
+                                and entry.stat(follow_symlinks=False).st_dev != parent_dev):
+                            drives.append({'path': entry.path, 'type': 'USB'})
+            except OSError:
+                continue
+        return drives
+
     @staticmethod
     def _list_macos_drives() -> List[dict]:
         """List USB drives on macOS"""
         drives = []
 
         try:
-            result = subprocess.run(
-                ['diskutil', 'list', '-plist', 'external'],
-                capture_output=True,
-                text=True
-            )
-
-            # Parse output for /Volumes paths
+            # Parse /Volumes paths
             volumes_path = Path('/Volumes')
             if volumes_path.exists():
                 for volume in volumes_path.iterdir():
@@ -220,11 +515,11 @@ Next steps:
 
         logger.info(f"Formatting {usb_path} as {fs_type}...")
 
-        if platform.system() == "Windows":
+        if _SYSTEM == "Windows":
             return USBPrepper._format_windows(usb_path, fs_type)
-        elif platform.system() == "Linux":
+        elif _SYSTEM == "Linux":
             return USBPrepper._format_linux(usb_path, fs_type)
-        elif platform.system() == "Darwin":
+        elif _SYSTEM == "Darwin":
             return USBPrepper._format_macos(usb_path, fs_type)
 
         logger.error("Unsupported platform")
@@ -250,16 +545,16 @@ Next steps:
         """Format drive on Linux"""
         try:
             # Unmount first
-            subprocess.run(['umount', device], stderr=subprocess.DEVNULL)
+            _spawn(['umount', device], quiet=True)
 
             # Format
             fstype = 'vfat' if fs_type == 'FAT32' else 'ntfs'
-            subprocess.run(
-                ['mkfs.' + fstype, device],
-                check=True
-            )
+            returncode = _spawn(['mkfs.' + fstype, device])
+            if returncode != 0:
+                logger.error(f"Format failed: mkfs.{fstype} exited with status {returncode}")
+                return False
             return True
-        except subprocess.CalledProcessError as e:
+        except OSError as e:
             logger.error(f"Format failed: {e}")
             return False
 
@@ -280,11 +575,7 @@ Next steps:
 
 def interactive_usb_prep():
     """Interactive USB preparation wizard"""
-    print("""
-╔═══════════════════════════════════════════════════════════════╗
-║              USB Drive Preparation Wizard                     ║
-╚═══════════════════════════════════════════════════════════════╝
-    """)
+    print(_WIZARD_BANNER, end='', flush=True)
 
     # List available drives
     drives = USBPrepper.list_usb_drives()